@@ -6,11 +6,12 @@ import base64
 import os
 from typing import Dict, Tuple
 import urllib3
+from config import ENV_LINE_RE, ENV_PATH, read_env_file
+from fineract_client import get_session
 
 # Disable SSL warnings
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
-
 class AuthManager:
     """Handle Fineract authentication and credential management"""
     
@@ -44,8 +45,9 @@ class AuthManager:
                 "password": password
             }
             
-            # Make authentication request
-            response = requests.post(
+            # Make authentication request over the shared pooled session, so the
+            # connection can be reused by the API calls that follow
+            response = get_session().post(
                 auth_url,
                 json=payload,
                 headers=headers,
@@ -89,7 +91,7 @@ class AuthManager:
         return f"Basic {encoded}"
     
     @staticmethod
-    def save_credentials(server_url: str, tenant_id: str, username: str, password: str, env_path: str = ".env"):
+    def save_credentials(server_url: str, tenant_id: str, username: str, password: str, env_path: str = ENV_PATH):
         """
         Save credentials to .env file
         
@@ -110,10 +112,10 @@ class AuthManager:
             base_url = server_url
         
         # Read existing .env or create new
-        env_lines = []
+        content = ""
         if os.path.exists(env_path):
             with open(env_path, 'r') as f:
-                env_lines = f.readlines()
+                content = f.read()
         
         # Update or add credentials
         credentials_map = {
@@ -125,26 +127,31 @@ class AuthManager:
         # Track which keys were updated
         updated_keys = set()
         
-        # Update existing lines
-        for i, line in enumerate(env_lines):
-            line = line.strip()
-            if '=' in line and not line.startswith('#'):
-                key = line.split('=')[0].strip()
-                if key in credentials_map:
-                    env_lines[i] = f"{key}={credentials_map[key]}\n"
-                    updated_keys.add(key)
+        def replace_value(match):
+            key = match.group(1)
+            if key not in credentials_map:
+                return match.group(0)
+            updated_keys.add(key)
+            # Keep everything before the value (e.g. an "export " prefix)
+            prefix = match.group(0)[:match.start(2) - match.start(0)]
+            return f"{prefix}{credentials_map[key]}"
+        
+        # Update existing lines in a single pass
+        content = ENV_LINE_RE.sub(replace_value, content)
         
         # Add missing keys
+        if content and not content.endswith('\n'):
+            content += '\n'
         for key, value in credentials_map.items():
             if key not in updated_keys:
-                env_lines.append(f"{key}={value}\n")
+                content += f"{key}={value}\n"
         
         # Write back to .env
         with open(env_path, 'w') as f:
-            f.writelines(env_lines)
+            f.write(content)
     
     @staticmethod
-    def is_authenticated(env_path: str = ".env") -> bool:
+    def is_authenticated(env_path: str = ENV_PATH) -> bool:
         """
         Check if valid credentials exist
         
@@ -159,27 +166,19 @@ class AuthManager:
         
         required_keys = ['FINERACT_BASE_URL', 'FINERACT_AUTH_TOKEN', 'FINERACT_TENANT_ID']
         
-        with open(env_path, 'r') as f:
-            content = f.read()
-            
+        # Parse every KEY=VALUE pair once, as Config does (first occurrence wins)
+        env_values = read_env_file(env_path)
+        
         for key in required_keys:
-            # Check if key exists and has a value
-            if f"{key}=" not in content:
+            value = env_values.get(key)
+            # Check if value is missing, empty or placeholder
+            if not value or value.startswith('your') or value.startswith('https://your'):
                 return False
-            
-            # Extract the value after the equals sign
-            for line in content.split('\n'):
-                if line.strip().startswith(f"{key}="):
-                    value = line.split('=', 1)[1].strip()
-                    # Check if value is empty or placeholder
-                    if not value or value.startswith('your') or value.startswith('https://your'):
-                        return False
-                    break
         
         return True
     
     @staticmethod
-    def clear_credentials(env_path: str = ".env"):
+    def clear_credentials(env_path: str = ENV_PATH):
         """
         Clear saved credentials (logout)
         
@@ -190,13 +189,16 @@ class AuthManager:
             return
         
         with open(env_path, 'r') as f:
-            lines = f.readlines()
+            content = f.read()
+        
+        def clear_value(match):
+            if not match.group(1).startswith('FINERACT_'):
+                return match.group(0)
+            # Keep the key (and any "export " prefix), drop the value
+            return match.group(0)[:match.start(2) - match.start(0)]
         
         # Clear credential values
-        for i, line in enumerate(lines):
-            if line.strip().startswith('FINERACT_'):
-                key = line.split('=')[0]
-                lines[i] = f"{key}=\n"
+        content = ENV_LINE_RE.sub(clear_value, content)
         
         with open(env_path, 'w') as f:
-            f.writelines(lines)
+            f.write(content)
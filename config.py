@@ -2,10 +2,73 @@
 Configuration module for loading environment variables
 """
 import os
-from dotenv import load_dotenv
+import re
+from typing import Dict
+
+# Matches one KEY=VALUE line of a .env file, with an optional "export "
+# prefix (comments never match); shared by the loader and AuthManager
+ENV_LINE_RE = re.compile(r'^[ \t]*(?:export[ \t]+)?([A-Za-z_][A-Za-z0-9_]*)[ \t]*=([^\r\n]*)', re.M)
+
+
+def parse_env_value(raw: str) -> str:
+    """
+    Normalize the raw value part of a .env line
+    
+    Args:
+        raw: Text after the '=' sign
+        
+    Returns:
+        The value without surrounding quotes or a trailing inline comment
+    """
+    value = raw.strip()
+    if len(value) >= 2 and value[0] == value[-1] and value[0] in '"\'':
+        # Quoted value: keep everything between the quotes
+        return value[1:-1]
+    # Unquoted value: drop any trailing inline comment
+    return value.split(' #', 1)[0].rstrip()
+
+
+def read_env_file(env_path: str) -> Dict[str, str]:
+    """
+    Parse a .env file in one regex pass
+    
+    Args:
+        env_path: Path to .env file
+        
+    Returns:
+        Dict of KEY -> value (the first occurrence of a key wins);
+        empty if the file does not exist
+    """
+    if not os.path.exists(env_path):
+        return {}
+    
+    with open(env_path, 'r', encoding='utf-8') as f:
+        content = f.read()
+    
+    values = {}
+    for key, raw in ENV_LINE_RE.findall(content):
+        values.setdefault(key, parse_env_value(raw))
+    return values
+
+
+def _load_env_file(env_path: str) -> None:
+    """
+    Load KEY=VALUE pairs from a .env file into os.environ
+    
+    Variables already set in the environment take precedence.
+    
+    Args:
+        env_path: Path to .env file
+    """
+    for key, value in read_env_file(env_path).items():
+        os.environ.setdefault(key, value)
+
+
+# The .env file next to this module (read here, written by AuthManager)
+ENV_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".env")
 
 # Load environment variables from .env file
-load_dotenv()
+_load_env_file(ENV_PATH)
 
 class Config:
     """Application configuration"""
@@ -20,6 +83,9 @@ class Config:
     TIME_FORMAT = os.getenv("TIME_FORMAT", "dd MMMM yyyy HH:mm:ss")
     LOCALE = os.getenv("LOCALE", "en")
     
+    # HTTP connection pool (keep-alive connections to the Fineract server)
+    HTTP_POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", 16))
+    
     # Storage Paths - desktop folder is in parent Kugelblitz directory
     _base_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "desktop")
     JSON_STORAGE_PATH = os.getenv("JSON_STORAGE_PATH", os.path.join(_base_dir, "transactions.json"))
@@ -31,6 +97,10 @@ class Config:
     PORT = int(os.getenv("PORT", 8000))
     DEBUG = os.getenv("DEBUG", "True").lower() == "true"
     
+    # Server worker processes and the cap on concurrent connections per worker
+    WORKERS = int(os.getenv("WORKERS") or max(2, os.cpu_count() or 1))
+    LIMIT_CONCURRENCY = int(os.getenv("LIMIT_CONCURRENCY", 200))
+    
     @classmethod
     def validate(cls):
         """Validate that required configuration is present"""
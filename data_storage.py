@@ -1,26 +1,55 @@
 """
 JSON data storage handler for transactions
 """
-import json
+import orjson
 import os
 from typing import List, Dict, Any
 from datetime import datetime
 from config import Config
 
+# File buffer sizes for streamed reads/writes (Python's default is only 8 KB)
+READ_BUFFER_SIZE = 256 * 1024
+WRITE_BUFFER_SIZE = 1 << 20
 
-class DateTimeEncoder(json.JSONEncoder):
-    """Custom JSON encoder to handle datetime objects"""
-    def default(self, obj):
-        if isinstance(obj, datetime):
-            return obj.strftime("%d %B %Y %H:%M:%S")
-        return super().default(obj)
+# orjson options shared by every JSON file written by the tool
+JSON_OPTIONS = orjson.OPT_INDENT_2 | orjson.OPT_PASSTHROUGH_DATETIME
+
+# Same options without indentation, for single-line JSON Lines records
+JSONL_OPTIONS = JSON_OPTIONS & ~orjson.OPT_INDENT_2
+
+
+def json_default(obj):
+    """Serialize types orjson does not handle natively (datetimes use the Fineract format)"""
+    if isinstance(obj, datetime):
+        return obj.strftime("%d %B %Y %H:%M:%S")
+    raise TypeError(f"Type is not JSON serializable: {type(obj).__name__}")
+
+
+def dump_json(data: Any) -> bytes:
+    """
+    Serialize data to indented UTF-8 JSON bytes
+    
+    Args:
+        data: JSON-compatible data (datetimes allowed)
+        
+    Returns:
+        Encoded JSON document
+    """
+    return orjson.dumps(data, default=json_default, option=JSON_OPTIONS)
 
 
 class DataStorage:
-    """Handle JSON file operations for transaction data"""
+    """
+    Handle JSON file operations for transaction data
+    
+    Transactions live in a JSON snapshot (file_path) plus an append-only
+    JSON Lines log next to it (file_path + 'l'), so single appends never
+    rewrite the snapshot. save_transactions folds the log back in.
+    """
     
     def __init__(self, file_path: str = None):
         self.file_path = file_path or Config.JSON_STORAGE_PATH
+        self.log_path = self.file_path + 'l'
         self._ensure_directory()
     
     def _ensure_directory(self):
@@ -41,30 +70,46 @@ class DataStorage:
             "transactions": transactions
         }
         
-        with open(self.file_path, 'w', encoding='utf-8') as f:
-            json.dump(data, f, indent=2, ensure_ascii=False, cls=DateTimeEncoder)
+        with open(self.file_path, 'wb') as f:
+            f.write(dump_json(data))
+        
+        # The snapshot now holds everything; drop the append log
+        if os.path.exists(self.log_path):
+            os.remove(self.log_path)
     
     def load_transactions(self) -> List[Dict[str, Any]]:
         """
-        Load transactions from JSON file
+        Load transactions from JSON file and the append log
         
         Returns:
             List of transaction dictionaries
         """
-        if not os.path.exists(self.file_path):
-            return []
+        transactions = []
+        
+        if os.path.exists(self.file_path):
+            try:
+                with open(self.file_path, 'rb') as f:
+                    data = orjson.loads(f.read())
+                    transactions = data.get('transactions', [])
+            except orjson.JSONDecodeError:
+                transactions = []
         
-        try:
-            with open(self.file_path, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-                return data.get('transactions', [])
-        except json.JSONDecodeError:
-            return []
+        if os.path.exists(self.log_path):
+            with open(self.log_path, 'rb', buffering=READ_BUFFER_SIZE) as f:
+                for line in f:
+                    try:
+                        transactions.append(orjson.loads(line))
+                    except orjson.JSONDecodeError:
+                        # Blank or partially written line
+                        continue
+        
+        return transactions
     
     def clear_transactions(self) -> None:
         """Clear all stored transactions"""
-        if os.path.exists(self.file_path):
-            os.remove(self.file_path)
+        for path in (self.file_path, self.log_path):
+            if os.path.exists(path):
+                os.remove(path)
     
     def append_transaction(self, transaction: Dict[str, Any]) -> None:
         """
@@ -73,9 +118,10 @@ class DataStorage:
         Args:
             transaction: Transaction dictionary
         """
-        transactions = self.load_transactions()
-        transactions.append(transaction)
-        self.save_transactions(transactions)
+        record = orjson.dumps(transaction, default=json_default, option=JSONL_OPTIONS)
+        
+        with open(self.log_path, 'ab') as f:
+            f.write(record + b'\n')
     
     def get_transaction_count(self) -> int:
         """
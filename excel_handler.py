@@ -1,12 +1,85 @@
 """
 Excel file handling for transaction import/export
 """
-import pandas as pd
+import csv
+import math
+from openpyxl import Workbook, load_workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Alignment, Border, Font, Side
 from typing import List, Dict, Any
 from datetime import datetime
 from config import Config
+from data_storage import READ_BUFFER_SIZE, WRITE_BUFFER_SIZE
 import os
 
+# Transaction fields written to Excel, in column order, with readable headers
+EXPORT_COLUMNS = [
+    ('loan_id', 'Loan ID'),
+    ('transaction_id', 'Transaction ID'),
+    ('transaction_date', 'Transaction Date'),
+    ('transaction_amount', 'Transaction Amount'),
+    ('payment_type_id', 'Payment Type ID'),
+    ('channel_type_id', 'Channel Type ID')
+]
+
+# Columns an imported file must provide
+REQUIRED_COLUMNS = [
+    'loan_id',
+    'transaction_date',
+    'transaction_amount',
+    'payment_type_id',
+    'channel_type_id'
+]
+
+# Readable header -> transaction field
+_COLUMN_MAPPING = {header: key for key, header in EXPORT_COLUMNS}
+
+# Header styling (bold, bordered, centered), built once and shared by every header cell
+_THIN_SIDE = Side(style='thin')
+HEADER_FONT = Font(bold=True)
+HEADER_BORDER = Border(left=_THIN_SIDE, right=_THIN_SIDE, top=_THIN_SIDE, bottom=_THIN_SIDE)
+HEADER_ALIGNMENT = Alignment(horizontal='center', vertical='top')
+
+
+def _normalize_header(header: List[Any]) -> List[str]:
+    """
+    Map an imported header row to transaction field names
+    
+    Args:
+        header: Header cell values (trailing empty cells already removed)
+        
+    Returns:
+        Field name for each column
+    """
+    # Handle both original and readable names
+    columns = [
+        _COLUMN_MAPPING.get(name, str(name)) if name not in (None, '') else f"Unnamed: {i}"
+        for i, name in enumerate(header)
+    ]
+    
+    missing_columns = [col for col in REQUIRED_COLUMNS if col not in columns]
+    if missing_columns:
+        raise ValueError(f"Missing required columns: {', '.join(missing_columns)}")
+    
+    return columns
+
+
+def _parse_csv_value(value: str) -> Any:
+    """Convert a CSV cell to None, int, float or str (like Excel cell values)"""
+    value = value.strip()
+    if not value:
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        pass
+    try:
+        number = float(value)
+    except ValueError:
+        return value
+    # "nan"/"inf" are not amounts; keep them as text so validation rejects them
+    return number if math.isfinite(number) else value
+
 
 class ExcelHandler:
     """Handle Excel import and export operations"""
@@ -31,34 +104,56 @@ class ExcelHandler:
         if directory and not os.path.exists(directory):
             os.makedirs(directory)
         
-        # Convert to DataFrame
-        df = pd.DataFrame(transactions)
+        # Stream rows straight into a write-only workbook
+        wb = Workbook(write_only=True)
+        ws = wb.create_sheet('Sheet1')
         
-        # Ensure required columns exist and are in the correct order
-        columns = [
-            'loan_id',
-            'transaction_id',
-            'transaction_date',
-            'transaction_amount',
-            'payment_type_id',
-            'channel_type_id'
-        ]
+        header_row = []
+        for _, header in EXPORT_COLUMNS:
+            cell = WriteOnlyCell(ws, value=header)
+            cell.font = HEADER_FONT
+            cell.border = HEADER_BORDER
+            cell.alignment = HEADER_ALIGNMENT
+            header_row.append(cell)
+        ws.append(header_row)
         
-        # Reorder columns
-        df = df[columns]
-        
-        # Rename columns for better readability
-        df.columns = [
-            'Loan ID',
-            'Transaction ID',
-            'Transaction Date',
-            'Transaction Amount',
-            'Payment Type ID',
-            'Channel Type ID'
-        ]
+        for transaction in transactions:
+            ws.append(tuple(transaction.get(key) for key, _ in EXPORT_COLUMNS))
+        
+        # zipfile emits many small compressed chunks; batch them into large writes
+        with open(file_path, 'wb', buffering=WRITE_BUFFER_SIZE) as f:
+            wb.save(f)
+        
+        return file_path
+    
+    @staticmethod
+    def export_to_csv(transactions: List[Dict[str, Any]], file_path: str = None) -> str:
+        """
+        Export transactions to CSV file (much faster than xlsx for large exports)
+        
+        Args:
+            transactions: List of transaction dictionaries
+            file_path: Optional output file path
+            
+        Returns:
+            Path to the created CSV file
+        """
+        if not file_path:
+            file_path = os.path.splitext(Config.EXCEL_EXPORT_PATH)[0] + '.csv'
         
-        # Export to Excel
-        df.to_excel(file_path, index=False, engine='openpyxl')
+        # Ensure directory exists
+        directory = os.path.dirname(file_path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        
+        # utf-8-sig lets Excel detect the encoding when the file is opened
+        with open(file_path, 'w', newline='', encoding='utf-8-sig', buffering=WRITE_BUFFER_SIZE) as f:
+            writer = csv.writer(f)
+            writer.writerow([header for _, header in EXPORT_COLUMNS])
+            writer.writerows(
+                [transaction.get(key) for key, _ in EXPORT_COLUMNS]
+                for transaction in transactions
+            )
         
         return file_path
     
@@ -76,42 +171,61 @@ class ExcelHandler:
         if not os.path.exists(file_path):
             raise FileNotFoundError(f"Excel file not found: {file_path}")
         
-        # Read Excel file
-        df = pd.read_excel(file_path, engine='openpyxl')
-        
-        # Normalize column names (handle both original and readable names)
-        column_mapping = {
-            'Loan ID': 'loan_id',
-            'Transaction ID': 'transaction_id',
-            'Transaction Date': 'transaction_date',
-            'Transaction Amount': 'transaction_amount',
-            'Payment Type ID': 'payment_type_id',
-            'Channel Type ID': 'channel_type_id'
-        }
-        
-        df.rename(columns=column_mapping, inplace=True)
-        
-        # Validate required columns
-        required_columns = [
-            'loan_id',
-            'transaction_date',
-            'transaction_amount',
-            'payment_type_id',
-            'channel_type_id'
-        ]
+        # Read Excel file row by row without building the full workbook in memory
+        wb = load_workbook(file_path, read_only=True, data_only=True)
+        try:
+            ws = wb.active
+            header = list(next(ws.iter_rows(max_row=1, values_only=True), ()))
+            while header and header[-1] is None:
+                header.pop()
+            
+            # Normalize column names and validate required columns
+            columns = _normalize_header(header)
+            
+            # Only read as many columns as there are headers, so stray
+            # cells or formatting far to the right don't widen every row
+            rows = ws.iter_rows(min_row=2, max_col=len(header) or None, values_only=True)
+            
+            # Convert to list of dictionaries (empty cells are already None)
+            transactions = [
+                dict(zip(columns, row))
+                for row in rows
+                if any(value is not None for value in row)
+            ]
+        finally:
+            wb.close()
         
-        missing_columns = [col for col in required_columns if col not in df.columns]
-        if missing_columns:
-            raise ValueError(f"Missing required columns: {', '.join(missing_columns)}")
+        return transactions
+    
+    @staticmethod
+    def import_from_csv(file_path: str) -> List[Dict[str, Any]]:
+        """
+        Import transactions from CSV file
         
-        # Convert to list of dictionaries
-        transactions = df.to_dict('records')
+        Args:
+            file_path: Path to CSV file
+            
+        Returns:
+            List of transaction dictionaries
+        """
+        if not os.path.exists(file_path):
+            raise FileNotFoundError(f"CSV file not found: {file_path}")
         
-        # Clean up NaN values
-        for transaction in transactions:
-            for key, value in transaction.items():
-                if pd.isna(value):
-                    transaction[key] = None
+        # utf-8-sig also accepts files without a BOM
+        with open(file_path, 'r', newline='', encoding='utf-8-sig', buffering=READ_BUFFER_SIZE) as f:
+            reader = csv.reader(f)
+            header = next(reader, [])
+            while header and not header[-1].strip():
+                header.pop()
+            
+            # Normalize column names and validate required columns
+            columns = _normalize_header([name.strip() for name in header])
+            
+            transactions = []
+            for row in reader:
+                values = [_parse_csv_value(value) for value in row[:len(columns)]]
+                if any(value is not None for value in values):
+                    transactions.append(dict(zip(columns, values)))
         
         return transactions
     
@@ -143,7 +257,8 @@ class ExcelHandler:
             int(transaction['loan_id'])
             int(transaction['payment_type_id'])
             int(transaction['channel_type_id'])
-            float(transaction['transaction_amount'])
+            if not math.isfinite(float(transaction['transaction_amount'])):
+                return False
         except (ValueError, TypeError):
             return False
         
@@ -2,25 +2,105 @@
 Fineract API Client for transaction operations
 """
 import requests
-import json
+from requests.adapters import HTTPAdapter
+import ijson
+import orjson
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
-from typing import Dict, List, Any, Optional
+from functools import lru_cache
+from types import MappingProxyType
+from typing import Dict, List, Any, Optional, Callable, Iterator, Tuple, Mapping
 from config import Config
+import logging
 import urllib3
+import random
+import re
 import time
 
+logger = logging.getLogger(__name__)
+
 # Disable SSL warnings for development
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
+# Number of keep-alive connections kept open to the Fineract server
+POOL_SIZE = max(1, Config.HTTP_POOL_SIZE)
+
+# Default number of concurrent API calls used by the batch helpers
+BATCH_WORKERS = min(8, POOL_SIZE)
+
+# Locates the first "defaultUserMessage" string in a raw Fineract error body
+_ERROR_MESSAGE_RE = re.compile(rb'"defaultUserMessage"\s*:\s*"((?:[^"\\]|\\.)*)"')
+
+
+def extract_error_message(response: requests.Response) -> str:
+    """
+    Get the user-facing message from a Fineract error response
+    
+    The message is pulled straight out of the raw bytes, so the (often
+    large) error envelope is only fully parsed when the field is missing.
+    
+    Args:
+        response: Non-200 response from the Fineract API
+        
+    Returns:
+        defaultUserMessage, developerMessage or the raw response text
+    """
+    content = response.content
+    match = _ERROR_MESSAGE_RE.search(content)
+    if match:
+        try:
+            # Decode JSON string escapes (\", \uXXXX, ...)
+            return orjson.loads(b'"' + match.group(1) + b'"')
+        except orjson.JSONDecodeError:
+            pass
+    
+    try:
+        error_data = orjson.loads(content)
+        return error_data.get('defaultUserMessage', error_data.get('developerMessage', response.text))
+    except Exception:
+        return response.text
+
+
+def is_network_error(error: Exception) -> bool:
+    """Check for any connection or timeout error (the request may have reached the server)"""
+    return isinstance(error, (requests.exceptions.ConnectionError, requests.exceptions.Timeout))
+
 
-def retry_on_network_error(max_retries=5, initial_delay=2, max_delay=30):
+def is_connect_error(error: Exception) -> bool:
     """
-    Decorator to retry API calls on network errors with exponential backoff
+    Check for an error raised while setting up the connection
+    
+    The request was certainly never sent, so even non-idempotent calls
+    can be retried. Read timeouts and resets after sending are excluded.
+    
+    Args:
+        error: Exception raised by a requests call
+        
+    Returns:
+        True if the connection could not be established
+    """
+    if isinstance(error, requests.exceptions.ConnectTimeout):
+        return True
+    if isinstance(error, requests.exceptions.ConnectionError) and error.args:
+        # requests wraps urllib3's MaxRetryError; its reason tells which phase failed
+        reason = getattr(error.args[0], 'reason', None)
+        return isinstance(reason, urllib3.exceptions.NewConnectionError)
+    return False
+
+
+def retry_on_network_error(max_retries=5, initial_delay=2, max_delay=30, jitter=0.5,
+                           retryable: Callable[[Exception], bool] = is_network_error):
+    """
+    Decorator to retry API calls on network errors with jittered exponential backoff
     
     Args:
         max_retries: Maximum number of retry attempts
         initial_delay: Initial delay in seconds before first retry
         max_delay: Maximum delay between retries
+        jitter: Fraction by which each wait is randomly stretched or shrunk,
+            so concurrent callers don't retry in lockstep
+        retryable: Decides which errors are retried (use is_connect_error
+            for calls that must not be sent twice)
     """
     def decorator(func):
         def wrapper(*args, **kwargs):
@@ -35,23 +115,18 @@ def retry_on_network_error(max_retries=5, initial_delay=2, max_delay=30):
                         requests.exceptions.RequestException) as e:
                     last_exception = e
                     
-                    # Check if it's a network-related error
-                    error_str = str(e).lower()
-                    is_network_error = any(keyword in error_str for keyword in [
-                        'connection', 'timeout', 'network', 'unreachable', 
-                        'failed to establish', 'connection reset'
-                    ])
-                    
                     # Don't retry on HTTP errors (400, 403, 500, etc.) - those are server-side
                     if hasattr(e, 'response') and e.response is not None:
                         # This is an HTTP error, not a network error - don't retry
                         raise
                     
-                    if is_network_error and attempt < max_retries:
-                        print(f"\n⚠️  Network error detected (attempt {attempt + 1}/{max_retries + 1})")
-                        print(f"   Error: {str(e)}")
-                        print(f"   Waiting {delay} seconds before retry...")
-                        time.sleep(delay)
+                    if retryable(e) and attempt < max_retries:
+                        wait = delay * random.uniform(1 - jitter, 1 + jitter)
+                        logger.warning(
+                            "⚠️  Network error detected (attempt %d/%d): %s. Waiting %.1f seconds before retry...",
+                            attempt + 1, max_retries + 1, e, wait
+                        )
+                        time.sleep(wait)
                         
                         # Exponential backoff
                         delay = min(delay * 2, max_delay)
@@ -66,25 +141,108 @@ def retry_on_network_error(max_retries=5, initial_delay=2, max_delay=30):
     return decorator
 
 
+@lru_cache(maxsize=1)
+def _headers_template() -> Mapping[str, str]:
+    """Build the (read-only) default request headers once from Config"""
+    return MappingProxyType({
+        'Accept': 'application/json, text/plain, */*',
+        'Accept-Encoding': 'gzip, deflate',
+        'Authorization': Config.FINERACT_AUTH_TOKEN,
+        'Connection': 'keep-alive',
+        'Content-Type': 'application/json;charset=UTF-8',
+        'Fineract-Platform-TenantId': Config.FINERACT_TENANT_ID
+    })
+
+
+@lru_cache(maxsize=1)
+def get_session() -> requests.Session:
+    """
+    Get the process-wide pooled session used for all Fineract calls
+    
+    Sharing one session lets logins and every client instance reuse the
+    same keep-alive connections (and their TLS handshakes).
+    
+    Returns:
+        requests.Session with a pooled HTTPAdapter mounted
+    """
+    session = requests.Session()
+    # pool_block makes extra threads wait for a live connection instead of
+    # opening throwaway ones that are discarded after a single request
+    adapter = HTTPAdapter(
+        pool_connections=POOL_SIZE,
+        pool_maxsize=POOL_SIZE,
+        max_retries=0,
+        pool_block=True
+    )
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
 class FineractClient:
     """Client for interacting with Fineract API"""
     
     def __init__(self):
         self.base_url = Config.FINERACT_BASE_URL
-        self.headers = {
-            'Accept': 'application/json, text/plain, */*',
-            'Accept-Language': 'en-US,en;q=0.9',
-            'Authorization': Config.FINERACT_AUTH_TOKEN,
-            'Cache-Control': 'no-cache',
-            'Connection': 'keep-alive',
-            'Content-Type': 'application/json;charset=UTF-8',
-            'Expires': '0',
-            'Fineract-Platform-TenantId': Config.FINERACT_TENANT_ID,
-            'If-Modified-Since': '0',
-            'Pragma': 'no-cache'
+        self.headers = dict(_headers_template())
+        
+        # Shared pooled session (headers are sent per request)
+        self.session = get_session()
+        
+        # Payload fields that are identical for every call, built once
+        # CRITICAL: Match exactly what Fineract UI sends
+        # transactionAmount MUST be 0 to prevent creating reversal transactions
+        # timeFormat is required even though we don't use time component
+        self._undo_base = {
+            "transactionAmount": 0,  # Must be 0! Not the actual amount
+            "dateFormat": Config.DATE_FORMAT,
+            "timeFormat": Config.TIME_FORMAT,
+            "locale": Config.LOCALE
+        }
+        self._repayment_base = {
+            "isUseHoldAmount": False,
+            "dateFormat": Config.DATE_FORMAT,
+            "timeFormat": Config.TIME_FORMAT,
+            "locale": Config.LOCALE
         }
     
     @retry_on_network_error(max_retries=5, initial_delay=2, max_delay=30)
+    def _get(self, url: str, stream: bool = False) -> requests.Response:
+        """
+        Send a GET request, retrying network errors
+        
+        Args:
+            url: Full request URL
+            stream: Defer downloading the response body
+            
+        Returns:
+            The HTTP response (any status)
+        """
+        return self.session.get(url, headers=self.headers, timeout=30, stream=stream, verify=False)
+    
+    @retry_on_network_error(max_retries=5, initial_delay=2, max_delay=30, retryable=is_connect_error)
+    def _post(self, url: str, payload: Dict[str, Any]) -> requests.Response:
+        """
+        Send a JSON POST request, retrying only if it was never sent
+        
+        Repayments and undos move money, so read timeouts and resets after
+        sending are raised rather than risk applying the command twice.
+        
+        Args:
+            url: Full request URL
+            payload: JSON body
+            
+        Returns:
+            The HTTP response (any status)
+        """
+        return self.session.post(
+            url,
+            headers=self.headers,
+            data=orjson.dumps(payload),
+            timeout=30,
+            verify=False  # Disable SSL verification for development
+        )
+    
     def get_loan_details(self, loan_id: int) -> Dict[str, Any]:
         """
         Fetch loan details including all transactions
@@ -99,23 +257,14 @@ class FineractClient:
         url = f"{self.base_url}/loans/{loan_id}?associations=all"
         
         try:
-            response = requests.get(
-                url,
-                headers=self.headers,
-                verify=False,  # Disable SSL verification for development
-                timeout=30
-            )
+            response = self._get(url)
             
             # Check if request was successful
             if response.status_code == 200:
                 return response.json()
             else:
-                # Try to get error details from response
-                try:
-                    error_detail = response.json()
-                    error_msg = error_detail.get('defaultUserMessage', response.text)
-                except:
-                    error_msg = response.text
+                # Get error details from response
+                error_msg = extract_error_message(response)
                 
                 raise Exception(f"API Error (Status {response.status_code}): {error_msg}")
                 
@@ -126,7 +275,40 @@ class FineractClient:
         except requests.exceptions.RequestException as e:
             raise Exception(f"Failed to fetch loan details for loan {loan_id}: {str(e)}")
     
-    @retry_on_network_error(max_retries=5, initial_delay=2, max_delay=30)
+    def get_loan_transactions(self, loan_id: int) -> List[Dict[str, Any]]:
+        """
+        Fetch only the transactions of a loan
+        
+        Only the transactions association is requested (not the whole loan
+        graph), and the response is parsed incrementally so nothing but the
+        transactions[] items is ever materialized.
+        
+        Args:
+            loan_id: The loan ID to fetch
+            
+        Returns:
+            List of transaction dictionaries
+        """
+        url = f"{self.base_url}/loans/{loan_id}?associations=transactions"
+        
+        try:
+            with self._get(url, stream=True) as response:
+                if response.status_code != 200:
+                    error_msg = extract_error_message(response)
+                    
+                    raise Exception(f"API Error (Status {response.status_code}): {error_msg}")
+                
+                # Let urllib3 undo any gzip/deflate encoding before ijson reads it
+                response.raw.decode_content = True
+                return list(ijson.items(response.raw, 'transactions.item', use_float=True))
+                
+        except requests.exceptions.ConnectionError as e:
+            raise Exception(f"Connection failed to {url}. Check if Fineract server is running and accessible: {str(e)}")
+        except requests.exceptions.Timeout as e:
+            raise Exception(f"Request timeout for loan {loan_id}. Server took too long to respond: {str(e)}")
+        except requests.exceptions.RequestException as e:
+            raise Exception(f"Failed to fetch transactions for loan {loan_id}: {str(e)}")
+    
     def undo_transaction(
         self,
         loan_id: int,
@@ -148,33 +330,14 @@ class FineractClient:
         """
         url = f"{self.base_url}/loans/{loan_id}/transactions/{transaction_id}?command=undo"
         
-        # CRITICAL: Match exactly what Fineract UI sends
-        # transactionAmount MUST be 0 to prevent creating reversal transactions
-        # timeFormat is required even though we don't use time component
-        payload = {
-            "transactionDate": transaction_date,
-            "transactionAmount": 0,  # Must be 0! Not the actual amount
-            "dateFormat": Config.DATE_FORMAT,
-            "timeFormat": Config.TIME_FORMAT,
-            "locale": Config.LOCALE
-        }
+        payload = {**self._undo_base, "transactionDate": transaction_date}
         
         try:
-            response = requests.post(
-                url,
-                headers=self.headers,
-                data=json.dumps(payload),
-                verify=False,
-                timeout=30
-            )
+            response = self._post(url, payload)
             
             # Check for errors and extract actual error message
             if response.status_code != 200:
-                try:
-                    error_data = response.json()
-                    error_msg = error_data.get('defaultUserMessage', error_data.get('developerMessage', response.text))
-                except:
-                    error_msg = response.text
+                error_msg = extract_error_message(response)
                     
                 raise Exception(
                     f"Failed to undo transaction {transaction_id}: HTTP {response.status_code} - {error_msg}"
@@ -186,7 +349,6 @@ class FineractClient:
                 f"Failed to undo transaction {transaction_id} for loan {loan_id}: {str(e)}"
             )
     
-    @retry_on_network_error(max_retries=5, initial_delay=2, max_delay=30)
     def create_repayment(
         self,
         loan_id: int,
@@ -213,13 +375,10 @@ class FineractClient:
         url = f"{self.base_url}/loans/{loan_id}/transactions?command=repayment"
         
         payload = {
-            "isUseHoldAmount": False,
+            **self._repayment_base,
             "transactionAmount": transaction_amount,
             "npaAmount": npa_amount,
-            "transactionDate": transaction_date,
-            "dateFormat": Config.DATE_FORMAT,
-            "timeFormat": Config.TIME_FORMAT,
-            "locale": Config.LOCALE
+            "transactionDate": transaction_date
         }
         
         # Use valid defaults based on UI behavior
@@ -232,24 +391,14 @@ class FineractClient:
         payload["paymentTypeId"] = valid_payment_type_id
         payload["channelTypeId"] = valid_channel_type_id
         
-        print(f"DEBUG: Using paymentTypeId={valid_payment_type_id}, channelTypeId={valid_channel_type_id}")
+        logger.debug("Using paymentTypeId=%s, channelTypeId=%s", valid_payment_type_id, valid_channel_type_id)
         
         try:
-            response = requests.post(
-                url,
-                headers=self.headers,
-                data=json.dumps(payload),
-                verify=False,
-                timeout=30
-            )
+            response = self._post(url, payload)
             
             # Enhanced error handling like undo
             if response.status_code != 200:
-                try:
-                    error_data = response.json()
-                    error_msg = error_data.get('defaultUserMessage', error_data.get('developerMessage', response.text))
-                except:
-                    error_msg = response.text
+                error_msg = extract_error_message(response)
                     
                 raise Exception(
                     f"Failed to create repayment: HTTP {response.status_code} - {error_msg}"
@@ -260,3 +409,74 @@ class FineractClient:
             raise Exception(
                 f"Failed to create repayment for loan {loan_id}: {str(e)}"
             )
+    
+    def _run_batch(
+        self,
+        func: Callable[..., Dict[str, Any]],
+        items: List[Dict[str, Any]],
+        max_workers: int
+    ) -> Iterator[Tuple[Dict[str, Any], Optional[Dict[str, Any]], Optional[Exception]]]:
+        """
+        Run an API method concurrently for each item, sharing the pooled session
+        
+        Args:
+            func: Bound client method to call with each item as keyword arguments
+            items: List of keyword-argument dictionaries
+            max_workers: Maximum number of concurrent calls (capped at POOL_SIZE)
+            
+        Yields:
+            Tuple of (item, response, error) in completion order
+        """
+        max_workers = max(1, min(max_workers, POOL_SIZE))
+        
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {executor.submit(func, **item): item for item in items}
+            
+            for future in as_completed(futures):
+                item = futures[future]
+                try:
+                    yield item, future.result(), None
+                except Exception as e:
+                    yield item, None, e
+    
+    def batch_undo(
+        self,
+        items: List[Dict[str, Any]],
+        max_workers: int = BATCH_WORKERS
+    ) -> Iterator[Tuple[Dict[str, Any], Optional[Dict[str, Any]], Optional[Exception]]]:
+        """
+        Undo several independent transactions concurrently
+        
+        Only use this for transactions whose undo order does not matter
+        (e.g. transactions on different loans). Each call keeps its own
+        network retry behaviour.
+        
+        Args:
+            items: List of undo_transaction keyword-argument dictionaries
+            max_workers: Maximum number of concurrent calls
+            
+        Yields:
+            Tuple of (item, response, error) in completion order
+        """
+        return self._run_batch(self.undo_transaction, items, max_workers)
+    
+    def batch_create_repayment(
+        self,
+        items: List[Dict[str, Any]],
+        max_workers: int = BATCH_WORKERS
+    ) -> Iterator[Tuple[Dict[str, Any], Optional[Dict[str, Any]], Optional[Exception]]]:
+        """
+        Create several independent repayments concurrently
+        
+        Only use this for repayments whose order does not matter
+        (e.g. repayments on different loans). Each call keeps its own
+        network retry behaviour.
+        
+        Args:
+            items: List of create_repayment keyword-argument dictionaries
+            max_workers: Maximum number of concurrent calls
+            
+        Yields:
+            Tuple of (item, response, error) in completion order
+        """
+        return self._run_batch(self.create_repayment, items, max_workers)
@@ -5,10 +5,11 @@ from fastapi import FastAPI, HTTPException, UploadFile, File
 from fastapi.responses import FileResponse, HTMLResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel
 from typing import Optional
+import logging
 import os
-import shutil
 from datetime import datetime
 
 from transaction_manager import TransactionManager
@@ -17,8 +18,21 @@ from data_storage import DataStorage
 from config import Config
 from auth_manager import AuthManager
 
+# Third-party libraries (e.g. urllib3) log at WARNING; only the tool's own
+# modules emit debug output (per-transaction progress) when DEBUG is enabled
+logging.basicConfig(
+    level=logging.WARNING,
+    format="%(asctime)s %(levelname)s %(name)s: %(message)s"
+)
+for _name in (__name__, "transaction_manager", "fineract_client"):
+    logging.getLogger(_name).setLevel(logging.DEBUG if Config.DEBUG else logging.WARNING)
+logger = logging.getLogger(__name__)
+
 app = FastAPI(title="Transaction Management Tool", version="1.0.0")
 
+# Size of each chunk copied from an uploaded file to disk
+UPLOAD_CHUNK_SIZE = 1 << 20
+
 # Add CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -28,9 +42,12 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Static files live next to this module, whatever the working directory
+STATIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static")
+
 # Mount static files
-os.makedirs("static", exist_ok=True)
-app.mount("/static", StaticFiles(directory="static"), name="static")
+os.makedirs(STATIC_DIR, exist_ok=True)
+app.mount("/static", StaticFiles(directory=STATIC_DIR), name="static")
 
 # Initialize managers
 transaction_manager = TransactionManager()
@@ -38,25 +55,77 @@ excel_handler = ExcelHandler()
 data_storage = DataStorage()
 
 
+# (base_dir mtime, latest session folder) from the last directory scan
+_latest_session_cache = None
+
+
 # Helper function to get latest session folder
 def get_latest_session_folder():
-    """Get the most recent session folder path"""
+    """
+    Get the most recent session folder path
+    
+    The directory is only re-listed when its mtime changes (a session
+    folder was added or removed), so repeat calls cost a single stat.
+    """
+    global _latest_session_cache
     base_dir = os.path.dirname(Config.JSON_STORAGE_PATH)
     
-    if not os.path.exists(base_dir):
+    try:
+        mtime = os.stat(base_dir).st_mtime_ns
+    except FileNotFoundError:
         return None
     
-    session_folders = [
-        f for f in os.listdir(base_dir) 
-        if f.startswith('session_') and os.path.isdir(os.path.join(base_dir, f))
-    ]
+    if _latest_session_cache is not None and _latest_session_cache[0] == mtime:
+        return _latest_session_cache[1]
     
-    if not session_folders:
-        return None
+    # scandir's DirEntry.is_dir() reuses the readdir result (no extra stat)
+    with os.scandir(base_dir) as entries:
+        session_folders = [
+            entry.name for entry in entries
+            if entry.name.startswith('session_') and entry.is_dir()
+        ]
+    
+    latest = None
+    if session_folders:
+        # Names include the timestamp, so the max name is the latest
+        latest = os.path.join(base_dir, max(session_folders))
     
-    # Sort by name (which includes timestamp) to get latest
-    session_folders.sort(reverse=True)
-    return os.path.join(base_dir, session_folders[0])
+    _latest_session_cache = (mtime, latest)
+    return latest
+
+
+def is_export_current(export_path: str, session_storage: DataStorage) -> bool:
+    """Check whether an export file is newer than the session data it was built from"""
+    try:
+        export_mtime = os.stat(export_path).st_mtime_ns
+    except FileNotFoundError:
+        return False
+    
+    source_mtimes = [
+        os.stat(path).st_mtime_ns
+        for path in (session_storage.file_path, session_storage.log_path)
+        if os.path.exists(path)
+    ]
+    return bool(source_mtimes) and export_mtime > max(source_mtimes)
+
+
+def mark_valid_transactions(transactions: list) -> int:
+    """Validate imported transactions once, storing the result on each as '_valid'"""
+    valid_count = 0
+    for txn in transactions:
+        txn['_valid'] = excel_handler.validate_transaction_data(txn)
+        valid_count += txn['_valid']
+    return valid_count
+
+
+async def save_upload(file: UploadFile, path: str):
+    """Copy an uploaded file to disk in chunks, keeping disk writes off the event loop"""
+    with open(path, "wb") as buffer:
+        while True:
+            chunk = await file.read(UPLOAD_CHUNK_SIZE)
+            if not chunk:
+                break
+            await run_in_threadpool(buffer.write, chunk)
 
 
 # Pydantic models
@@ -163,10 +232,10 @@ async def get_auth_status():
 @app.get("/", response_class=HTMLResponse)
 async def serve_frontend():
     """Serve the frontend HTML"""
-    html_path = os.path.join("static", "index.html")
+    html_path = os.path.join(STATIC_DIR, "index.html")
     if os.path.exists(html_path):
-        with open(html_path, 'r', encoding='utf-8') as f:
-            return HTMLResponse(content=f.read())
+        # Streamed from disk by Starlette (with ETag/Last-Modified headers)
+        return FileResponse(html_path, media_type="text/html")
     else:
         return HTMLResponse(content="<h1>Frontend not found. Please create static/index.html</h1>")
 
@@ -183,7 +252,10 @@ async def undo_transactions(request: UndoRequest):
         Summary of undone transactions
     """
     try:
-        undone_txns, success_count, failure_count = transaction_manager.undo_transactions_by_date(
+        # The undo is a long chain of blocking Fineract calls; run it in the
+        # threadpool so other requests are not stalled behind it
+        undone_txns, success_count, failure_count = await run_in_threadpool(
+            transaction_manager.undo_transactions_by_date,
             loan_id=request.loan_id,
             cutoff_date=request.cutoff_date
         )
@@ -213,18 +285,21 @@ async def export_excel():
         if not session_folder:
             raise HTTPException(status_code=404, detail="No session found. Please run undo operation first.")
         
-        # Load transactions from session folder
         session_storage = DataStorage(os.path.join(session_folder, 'transactions.json'))
-        transactions = session_storage.load_transactions()
-        
-        if not transactions:
-            raise HTTPException(status_code=404, detail="No transactions found to export")
-        
-        # Export to Excel in session folder
         excel_path = os.path.join(session_folder, 'transactions.xlsx')
-        excel_handler.export_to_excel(transactions, excel_path)
         
-        print(f"✅ Excel exported to session: {excel_path}")
+        # Regenerate only if the session data changed since the last export
+        if not is_export_current(excel_path, session_storage):
+            # Load transactions from session folder
+            transactions = await run_in_threadpool(session_storage.load_transactions)
+            
+            if not transactions:
+                raise HTTPException(status_code=404, detail="No transactions found to export")
+            
+            # Export to Excel in session folder
+            await run_in_threadpool(excel_handler.export_to_excel, transactions, excel_path)
+            
+            logger.info("✅ Excel exported to session: %s", excel_path)
         
         return FileResponse(
             excel_path,
@@ -255,20 +330,103 @@ async def import_excel(file: UploadFile = File(...)):
         # Save uploaded file to session folder (as corrected version)
         excel_path = os.path.join(session_folder, 'transactions_corrected.xlsx')
         
-        with open(excel_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
+        await save_upload(file, excel_path)
         
-        print(f"✅ Corrected Excel saved to session: {excel_path}")
+        logger.info("✅ Corrected Excel saved to session: %s", excel_path)
         
         # Import transactions from corrected Excel
-        transactions = excel_handler.import_from_excel(excel_path)
+        transactions = await run_in_threadpool(excel_handler.import_from_excel, excel_path)
+        
+        # Validate transactions (flags are stored so replay need not re-validate)
+        valid_count = mark_valid_transactions(transactions)
+        
+        # Store in session folder for replay
+        session_storage = DataStorage(os.path.join(session_folder, 'transactions.json'))
+        await run_in_threadpool(session_storage.save_transactions, transactions)
+        
+        return {
+            "success": True,
+            "message": f"Imported {len(transactions)} transactions to session",
+            "total_count": len(transactions),
+            "valid_count": valid_count,
+            "invalid_count": len(transactions) - valid_count,
+            "session_folder": session_folder
+        }
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.get("/api/export-csv")
+async def export_csv():
+    """
+    Export stored transactions from latest session to CSV file (fast alternative to Excel)
+    
+    Returns:
+        CSV file download
+    """
+    try:
+        # Get latest session folder
+        session_folder = get_latest_session_folder()
+        if not session_folder:
+            raise HTTPException(status_code=404, detail="No session found. Please run undo operation first.")
         
-        # Validate transactions
-        valid_count = sum(1 for txn in transactions if excel_handler.validate_transaction_data(txn))
+        session_storage = DataStorage(os.path.join(session_folder, 'transactions.json'))
+        csv_path = os.path.join(session_folder, 'transactions.csv')
+        
+        # Regenerate only if the session data changed since the last export
+        if not is_export_current(csv_path, session_storage):
+            # Load transactions from session folder
+            transactions = await run_in_threadpool(session_storage.load_transactions)
+            
+            if not transactions:
+                raise HTTPException(status_code=404, detail="No transactions found to export")
+            
+            # Export to CSV in session folder
+            await run_in_threadpool(excel_handler.export_to_csv, transactions, csv_path)
+            
+            logger.info("✅ CSV exported to session: %s", csv_path)
+        
+        return FileResponse(
+            csv_path,
+            media_type="text/csv",
+            filename=f"transactions_{os.path.basename(session_folder)}.csv"
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.post("/api/import-csv")
+async def import_csv(file: UploadFile = File(...)):
+    """
+    Import CSV file with corrected transaction data into latest session
+    
+    Args:
+        file: Uploaded CSV file
+        
+    Returns:
+        Summary of imported data
+    """
+    try:
+        # Get latest session folder
+        session_folder = get_latest_session_folder()
+        if not session_folder:
+            raise HTTPException(status_code=404, detail="No session found. Please run undo operation first.")
+        
+        # Save uploaded file to session folder (as corrected version)
+        csv_path = os.path.join(session_folder, 'transactions_corrected.csv')
+        await save_upload(file, csv_path)
+        
+        logger.info("✅ Corrected CSV saved to session: %s", csv_path)
+        
+        # Import transactions from corrected CSV
+        transactions = await run_in_threadpool(excel_handler.import_from_csv, csv_path)
+        
+        # Validate transactions (flags are stored so replay need not re-validate)
+        valid_count = mark_valid_transactions(transactions)
         
         # Store in session folder for replay
         session_storage = DataStorage(os.path.join(session_folder, 'transactions.json'))
-        session_storage.save_transactions(transactions)
+        await run_in_threadpool(session_storage.save_transactions, transactions)
         
         return {
             "success": True,
@@ -298,22 +456,25 @@ async def replay_transactions():
         
         # Load transactions from session folder
         session_storage = DataStorage(os.path.join(session_folder, 'transactions.json'))
-        transactions = session_storage.load_transactions()
+        transactions = await run_in_threadpool(session_storage.load_transactions)
         
         if not transactions:
             raise HTTPException(status_code=404, detail="No transactions found to replay")
         
-        # Filter valid transactions
+        # Filter valid transactions, reusing the flags stored at import time
         valid_transactions = [
-            txn for txn in transactions 
-            if excel_handler.validate_transaction_data(txn)
+            txn for txn in transactions
+            if (txn.pop('_valid') if '_valid' in txn else excel_handler.validate_transaction_data(txn))
         ]
         
         if not valid_transactions:
             raise HTTPException(status_code=400, detail="No valid transactions to replay")
         
         # Replay transactions
-        success_count, failure_count = transaction_manager.replay_transactions(valid_transactions)
+        success_count, failure_count = await run_in_threadpool(
+            transaction_manager.replay_transactions,
+            valid_transactions
+        )
         
         return {
             "success": True,
@@ -335,7 +496,7 @@ async def get_status():
         Status information
     """
     try:
-        transactions = data_storage.load_transactions()
+        transactions = await run_in_threadpool(data_storage.load_transactions)
         
         return {
             "success": True,
@@ -348,4 +509,18 @@ async def get_status():
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host=Config.HOST, port=Config.PORT)
+    # loop/http "auto" pick uvloop and httptools (from uvicorn[standard]) when
+    # available, falling back to asyncio and h11 (e.g. uvloop on Windows).
+    # Multiple workers need the app as an import string; all shared state
+    # (credentials, sessions) lives on disk, so workers stay consistent.
+    uvicorn.run(
+        "main:app",
+        app_dir=os.path.dirname(os.path.abspath(__file__)),
+        host=Config.HOST,
+        port=Config.PORT,
+        workers=Config.WORKERS,
+        limit_concurrency=Config.LIMIT_CONCURRENCY,
+        backlog=1024,
+        loop="auto",
+        http="auto"
+    )
@@ -0,0 +1,127 @@
+"""
+Tests for the Fineract client's network retry behaviour
+"""
+import unittest
+from unittest import mock
+
+import requests
+import urllib3
+
+from fineract_client import FineractClient
+
+
+def make_response(status_code=200, body=b'{"resourceId": 42}'):
+    """Build a requests.Response with the given status and JSON body"""
+    response = requests.Response()
+    response.status_code = status_code
+    response._content = body
+    return response
+
+
+def connection_refused():
+    """Build the ConnectionError requests raises when a connection cannot be opened"""
+    reason = urllib3.exceptions.NewConnectionError(None, "Connection refused")
+    return requests.exceptions.ConnectionError(
+        urllib3.exceptions.MaxRetryError(None, "/loans", reason=reason)
+    )
+
+
+class RetryOnNetworkErrorTest(unittest.TestCase):
+    """POSTs are only retried when they were never sent; GETs on any network error"""
+
+    def setUp(self):
+        self.client = FineractClient()
+        self.client.session = mock.Mock()
+        sleep_patcher = mock.patch('fineract_client.time.sleep')
+        self.sleep = sleep_patcher.start()
+        self.addCleanup(sleep_patcher.stop)
+
+    def repay(self):
+        return self.client.create_repayment(
+            loan_id=5,
+            transaction_amount=100.0,
+            transaction_date="01 January 2025",
+            payment_type_id=1,
+            channel_type_id=1
+        )
+
+    def test_connect_error_is_retried(self):
+        self.client.session.post.side_effect = [
+            connection_refused(),
+            requests.exceptions.ConnectTimeout("slow connect"),
+            make_response()
+        ]
+
+        self.assertEqual(self.repay(), {"resourceId": 42})
+        self.assertEqual(self.client.session.post.call_count, 3)
+        self.assertEqual(self.sleep.call_count, 2)
+
+    def test_read_timeout_is_not_retried_for_post(self):
+        self.client.session.post.side_effect = [
+            requests.exceptions.ReadTimeout("slow response"),
+            make_response()
+        ]
+
+        with self.assertRaisesRegex(Exception, "Failed to create repayment for loan 5"):
+            self.repay()
+        self.assertEqual(self.client.session.post.call_count, 1)
+        self.sleep.assert_not_called()
+
+    def test_reset_after_send_is_not_retried_for_post(self):
+        self.client.session.post.side_effect = [
+            requests.exceptions.ConnectionError("Connection reset by peer"),
+            make_response()
+        ]
+
+        with self.assertRaisesRegex(Exception, "Failed to create repayment for loan 5"):
+            self.repay()
+        self.assertEqual(self.client.session.post.call_count, 1)
+
+    def test_read_timeout_is_retried_for_get(self):
+        self.client.session.get.side_effect = [
+            requests.exceptions.ReadTimeout("slow response"),
+            requests.exceptions.ConnectionError("Connection reset by peer"),
+            make_response(body=b'{"id": 5}')
+        ]
+
+        self.assertEqual(self.client.get_loan_details(5), {"id": 5})
+        self.assertEqual(self.client.session.get.call_count, 3)
+
+    def test_gives_up_after_max_retries(self):
+        self.client.session.post.side_effect = connection_refused()
+
+        with self.assertRaisesRegex(Exception, "Failed to create repayment for loan 5"):
+            self.repay()
+        self.assertEqual(self.client.session.post.call_count, 6)
+
+    def test_http_error_is_not_retried(self):
+        self.client.session.post.return_value = make_response(
+            403, b'{"defaultUserMessage": "Denied"}'
+        )
+
+        with self.assertRaisesRegex(Exception, "HTTP 403 - Denied"):
+            self.repay()
+        self.assertEqual(self.client.session.post.call_count, 1)
+        self.sleep.assert_not_called()
+
+    def test_batch_calls_retry(self):
+        self.client.session.post.side_effect = [
+            connection_refused(),
+            make_response()
+        ]
+        items = [{
+            'loan_id': 5,
+            'transaction_amount': 100.0,
+            'transaction_date': "01 January 2025",
+            'payment_type_id': 1,
+            'channel_type_id': 1
+        }]
+
+        results = list(self.client.batch_create_repayment(items))
+
+        self.assertEqual([(result, error) for _, result, error in results], [({"resourceId": 42}, None)])
+        self.assertEqual(self.client.session.post.call_count, 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,64 @@
+"""
+Tests for planning concurrent replay rounds
+"""
+import tempfile
+import unittest
+from unittest import mock
+
+from transaction_manager import TransactionManager
+
+
+def txn(loan_id, transaction_date="01 January 2025"):
+    """Build a minimal replay row"""
+    return {'loan_id': loan_id, 'transaction_date': transaction_date}
+
+
+class PlanReplayRoundsTest(unittest.TestCase):
+    """Each round holds at most one repayment per loan and never spans two dates"""
+
+    def plan(self, transactions):
+        return TransactionManager._plan_replay_rounds(transactions)
+
+    def test_same_loan_same_date_runs_in_consecutive_rounds_in_order(self):
+        rounds = self.plan([txn(1), txn(2), txn(1), txn(1)])
+
+        self.assertEqual(rounds, [[0, 1], [2], [3]])
+
+    def test_loan_id_representations_are_one_loan(self):
+        rounds = self.plan([txn(5), txn(5.0), txn("5")])
+
+        self.assertEqual(rounds, [[0], [1], [2]])
+
+    def test_rounds_never_cross_a_date_boundary(self):
+        rounds = self.plan([
+            txn(1, "01 January 2025"),
+            txn(2, "02 January 2025"),
+            txn(3, "02 January 2025"),
+            txn(1, "03 January 2025")
+        ])
+
+        self.assertEqual(rounds, [[0], [1, 2], [3]])
+
+    def test_unparseable_loan_id_gets_its_own_round(self):
+        rounds = self.plan([txn(1), txn("abc"), txn(None), {'transaction_date': "01 January 2025"}, txn(2)])
+
+        self.assertEqual(rounds, [[0, 4], [1], [2], [3]])
+
+
+class ReplayTransactionsTest(unittest.TestCase):
+    """Replay skips the batch call for rounds with nothing to post"""
+
+    def test_round_without_valid_rows_is_not_posted(self):
+        manager = TransactionManager()
+        manager.client = mock.Mock()
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        manager._base_dir = temp_dir.name
+
+        row = dict(txn("abc"), transaction_amount=10, payment_type_id=1, channel_type_id=1)
+        self.assertEqual(manager.replay_transactions([row]), (0, 1))
+        manager.client.batch_create_repayment.assert_not_called()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -2,11 +2,52 @@
 Transaction management logic for undo and replay operations
 """
 from typing import List, Dict, Any, Tuple
+from collections import deque
 from datetime import datetime
 from fineract_client import FineractClient
-from data_storage import DataStorage, DateTimeEncoder
+from data_storage import DataStorage, dump_json
+from functools import lru_cache
+import logging
+import os
 import re
 
+logger = logging.getLogger(__name__)
+
+# English month names as used by the Fineract "dd MMMM yyyy" format
+_MONTHS = {
+    name: number for number, name in enumerate([
+        'january', 'february', 'march', 'april', 'may', 'june', 'july',
+        'august', 'september', 'october', 'november', 'december'
+    ], 1)
+}
+
+# "04 December 2025 15:37:46" or "04 December 2025"
+_FINERACT_DATE_RE = re.compile(r'(\d{1,2}) ([A-Za-z]+) (\d{4})(?: (\d{1,2}):(\d{1,2}):(\d{1,2}))?$')
+
+# Fallback formats, tried in order with strptime
+_DATE_FORMATS = ["%d %B %Y %H:%M:%S", "%d %B %Y", "%Y-%m-%d", "%d-%m-%Y", "%d/%m/%Y"]
+
+
+@lru_cache(maxsize=4096)
+def _parse_date_text(date_str: str) -> datetime:
+    """Parse a date string, trying the Fineract format without strptime first"""
+    match = _FINERACT_DATE_RE.match(date_str)
+    if match:
+        day, month_name, year, hour, minute, second = match.groups()
+        month = _MONTHS.get(month_name.lower())
+        if month:
+            try:
+                return datetime(int(year), month, int(day), int(hour or 0), int(minute or 0), int(second or 0))
+            except ValueError:
+                pass
+    
+    for fmt in _DATE_FORMATS:
+        try:
+            return datetime.strptime(date_str, fmt)
+        except ValueError:
+            continue
+    raise ValueError(f"Unable to parse date: {date_str}")
+
 
 class TransactionManager:
     """Manage transaction undo and replay operations"""
@@ -14,6 +55,8 @@ class TransactionManager:
     def __init__(self):
         self.client = FineractClient()
         self.storage = DataStorage()
+        # Parent directory of every session folder
+        self._base_dir = os.path.dirname(self.storage.file_path)
     
     def parse_date_string(self, date_str: str) -> datetime:
         """
@@ -29,23 +72,29 @@ class TransactionManager:
             # Handle array format [year, month, day, hour, minute, second]
             return datetime(*date_str[:6])
         elif isinstance(date_str, str):
-            # Handle string format
-            try:
-                return datetime.strptime(date_str, "%d %B %Y %H:%M:%S")
-            except ValueError:
-                try:
-                    return datetime.strptime(date_str, "%d %B %Y")
-                except ValueError:
-                    # Try other common formats
-                    for fmt in ["%Y-%m-%d", "%d-%m-%Y", "%d/%m/%Y"]:
-                        try:
-                            return datetime.strptime(date_str, fmt)
-                        except ValueError:
-                            continue
-                    raise ValueError(f"Unable to parse date: {date_str}")
+            # Handle string format (results are cached, dates repeat a lot)
+            return _parse_date_text(date_str)
         else:
             raise ValueError(f"Unexpected date format: {type(date_str)}")
     
+    def date_sort_key(self, date_value) -> Tuple[int, ...]:
+        """
+        Build a comparable key for a Fineract date without creating a datetime
+        
+        Args:
+            date_value: Date as array ([year, month, day, ...]) or string
+            
+        Returns:
+            Tuple of (year, month, day, hour, minute, second)
+        """
+        if isinstance(date_value, list):
+            # Array dates already compare correctly as tuples
+            parts = tuple(date_value[:6])
+            return parts + (0,) * (6 - len(parts))
+        
+        dt = self.parse_date_string(date_value)
+        return (dt.year, dt.month, dt.day, dt.hour, dt.minute, dt.second)
+    
     def format_date_for_api(self, dt: datetime) -> str:
         """
         Format datetime object for Fineract API
@@ -58,6 +107,42 @@ class TransactionManager:
         """
         return dt.strftime("%d %B %Y %H:%M:%S")
     
+    def _order_undo_targets(
+        self,
+        transactions: List[Dict[str, Any]],
+        target_ids: set
+    ) -> List[Dict[str, Any]]:
+        """
+        Select target transactions and order them latest first
+        
+        Args:
+            transactions: Transactions from a loan fetch
+            target_ids: IDs of the transactions to undo
+            
+        Returns:
+            Target transactions sorted by date, then ID, descending
+        """
+        # Index the fetch once, then only look at the targets
+        by_id = {txn.get('id'): txn for txn in transactions}
+        
+        keyed = []
+        for txn_id in target_ids:
+            txn = by_id.get(txn_id)
+            if txn is None:
+                continue
+            
+            txn_date_raw = txn.get('date')
+            if not txn_date_raw:
+                continue
+            
+            try:
+                keyed.append((self.date_sort_key(txn_date_raw), txn_id, txn))
+            except:
+                continue
+        
+        keyed.sort(key=lambda item: item[:2], reverse=True)
+        return [txn for _, _, txn in keyed]
+    
     def undo_transactions_by_date(
         self,
         loan_id: int,
@@ -69,8 +154,9 @@ class TransactionManager:
         CRITICAL LOGIC:
         1. Create a session folder for this operation
         2. Fetch loan ONCE and identify which transaction IDs to undo (based on cutoff date)
-        3. Iteratively undo transactions by tracking IDs, not dates
-        4. Dates may change after each undo (Fineract recalculates), but IDs remain stable
+        3. Undo them latest first (by date, then ID), tracking IDs, not dates
+        4. IDs remain stable, so the loan is only re-fetched (and the remaining
+           order re-planned) after an undo fails
         
         Args:
             loan_id: The loan ID
@@ -80,22 +166,14 @@ class TransactionManager:
             Tuple of (undone_transactions, success_count, failure_count)
         """
         # Create a unique session folder for this operation
-        from datetime import datetime
-        import os
-        
         session_timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        session_folder = os.path.join(
-            os.path.dirname(self.storage.file_path),
-            f"session_{session_timestamp}_loan_{loan_id}"
-        )
+        session_folder = os.path.join(self._base_dir, f"session_{session_timestamp}_loan_{loan_id}")
         os.makedirs(session_folder, exist_ok=True)
         
         # Update storage path to use session folder
         session_storage = DataStorage(os.path.join(session_folder, 'transactions.json'))
         
-        print(f"\n{'='*60}")
-        print(f"NEW SESSION CREATED: {session_folder}")
-        print(f"{'='*60}\n")
+        logger.info("NEW SESSION CREATED: %s", session_folder)
         
         # Parse cutoff date
         try:
@@ -103,19 +181,19 @@ class TransactionManager:
         except Exception as e:
             raise Exception(f"Failed to parse cutoff date '{cutoff_date}': {e}")
         
-        print(f"DEBUG: Cutoff date: {cutoff_dt}")
+        logger.debug("Cutoff date: %s", cutoff_dt)
         
         # STEP 1: Fetch loan details ONCE and identify target transaction IDs
         try:
-            loan_details = self.client.get_loan_details(loan_id)
+            transactions = self.client.get_loan_transactions(loan_id)
         except Exception as e:
             raise Exception(f"Failed to fetch loan: {e}")
         
-        transactions = loan_details.get('transactions', [])
-        print(f"DEBUG: Found {len(transactions)} total transactions")
+        logger.debug("Found %d total transactions", len(transactions))
         
         # Identify which transaction IDs need to be undone
         target_txn_ids = []
+        cutoff_day = (cutoff_dt.year, cutoff_dt.month, cutoff_dt.day)
         
         for txn in transactions:
             # Check type
@@ -130,25 +208,25 @@ class TransactionManager:
             if txn.get('manuallyReversed', False):
                 continue
             
-            # Parse date
+            # Get (year, month, day) key
             txn_date_raw = txn.get('date')
             if not txn_date_raw:
                 continue
                 
             try:
-                txn_date = self.parse_date_string(txn_date_raw)
+                txn_day = self.date_sort_key(txn_date_raw)[:3]
             except:
                 continue
             
             # Include if >= cutoff date
             # Compare only date parts to ensure transactions ON the cutoff date are included
             # regardless of time component
-            if txn_date.date() >= cutoff_dt.date():
+            if txn_day >= cutoff_day:
                 target_txn_ids.append(txn.get('id'))
-                print(f"DEBUG: Transaction {txn.get('id')} will be undone (date: {txn_date.date()})")
+                logger.debug("Transaction %s will be undone (date: %04d-%02d-%02d)", txn.get('id'), *txn_day)
         
-        print(f"DEBUG: Identified {len(target_txn_ids)} transaction IDs to undo")
-        print(f"DEBUG: Target IDs: {target_txn_ids}")
+        logger.debug("Identified %d transaction IDs to undo", len(target_txn_ids))
+        logger.debug("Target IDs: %s", target_txn_ids)
         
         # STEP 2: Iteratively undo each target transaction
         undone_transactions = []
@@ -156,62 +234,38 @@ class TransactionManager:
         failure_count = 0
         remaining_ids = set(target_txn_ids)
         
-        while remaining_ids:
-            iteration = len(target_txn_ids) - len(remaining_ids) + 1
-            print(f"\n--- Iteration {iteration}/{len(target_txn_ids)} ---")
-            print(f"DEBUG: Remaining IDs to undo: {remaining_ids}")
-            
-            # Re-fetch to get current state (dates may have changed!)
-            try:
-                loan_details = self.client.get_loan_details(loan_id)
-            except Exception as e:
-                print(f"ERROR: Failed to fetch loan: {e}")
+        # Plan the undo order (latest first) from the fetch above; IDs are
+        # stable, so the loan is only re-fetched after a failed undo
+        undo_queue = deque(self._order_undo_targets(transactions, remaining_ids))
+        
+        # Every iteration settles one target ID, so the loop is bounded by the
+        # number of targets even if re-planning keeps returning transactions
+        for iteration in range(1, len(target_txn_ids) + 1):
+            if not undo_queue:
                 break
             
-            transactions = loan_details.get('transactions', [])
+            logger.debug("--- Iteration %d/%d ---", iteration, len(target_txn_ids))
+            logger.debug("Remaining IDs to undo: %s", remaining_ids)
             
-            # Find the LATEST transaction that's in our remaining_ids set
-            latest_target_txn = None
-            latest_date = None
+            latest_target_txn = undo_queue.popleft()
             
-            for txn in transactions:
-                txn_id = txn.get('id')
-                
-                # Skip if not in our target list
-                if txn_id not in remaining_ids:
-                    continue
-                
-                # Parse date
-                txn_date_raw = txn.get('date')
-                if not txn_date_raw:
-                    continue
-                    
-                try:
-                    txn_date = self.parse_date_string(txn_date_raw)
-                except:
-                    continue
-                
-                # Update if this is the latest so far
-                if latest_target_txn is None:
-                    latest_target_txn = txn
-                    latest_date = txn_date
-                elif txn_date > latest_date:
-                    latest_target_txn = txn
-                    latest_date = txn_date
-                elif txn_date == latest_date and txn_id > latest_target_txn.get('id'):
-                    latest_target_txn = txn
-            
-            # If we can't find any remaining target transaction, something's wrong
-            if latest_target_txn is None:
-                print(f"ERROR: Could not find any remaining target transactions!")
-                break
-            
-            # Undo this transaction
+            # Capture everything the undo and its record need from the planned
+            # snapshot once (only the chosen transaction needs a datetime)
             txn_id = latest_target_txn['id']
             txn_amount = latest_target_txn.get('amount', 0)
-            txn_date = latest_date
+            txn_date = self.parse_date_string(latest_target_txn['date'])
+            api_date = self.format_date_for_api(txn_date)
+            payment_detail = latest_target_txn.get('paymentDetailData', {})
+            txn_details = {
+                'loan_id': loan_id,
+                'transaction_id': txn_id,
+                'transaction_date': api_date,
+                'transaction_amount': txn_amount,
+                'payment_type_id': payment_detail.get('paymentType', {}).get('id', 0),
+                'channel_type_id': payment_detail.get('channelType', {}).get('id', 0)
+            }
             
-            print(f"DEBUG: Undoing transaction {txn_id} (current date: {txn_date})")
+            logger.debug("Undoing transaction %s (current date: %s)", txn_id, txn_date)
             
             try:
                 # Undo it
@@ -219,58 +273,108 @@ class TransactionManager:
                     loan_id=loan_id,
                     transaction_id=txn_id,
                     transaction_amount=txn_amount,
-                    transaction_date=self.format_date_for_api(txn_date)
+                    transaction_date=api_date
                 )
                 
                 # Store details
-                undone_txn = {
-                    'loan_id': loan_id,
-                    'transaction_id': txn_id,
-                    'transaction_date': self.format_date_for_api(txn_date),
-                    'transaction_amount': txn_amount,
-                    'payment_type_id': latest_target_txn.get('paymentDetailData', {}).get('paymentType', {}).get('id', 0),
-                    'channel_type_id': latest_target_txn.get('paymentDetailData', {}).get('channelType', {}).get('id', 0),
-                    'status': 'undone'
-                }
+                undone_txn = dict(txn_details, status='undone')
                 
                 undone_transactions.append(undone_txn)
                 success_count += 1
                 remaining_ids.remove(txn_id)
                 
-                print(f"✅ Successfully undone transaction {txn_id} ({len(remaining_ids)} remaining)")
+                logger.info("✅ Successfully undone transaction %s (%d remaining)", txn_id, len(remaining_ids))
                 
             except Exception as e:
                 error_msg = str(e)
-                print(f"❌ Failed to undo transaction {txn_id}: {error_msg}")
+                logger.error("❌ Failed to undo transaction %s: %s", txn_id, error_msg)
                 
                 # Store failure
-                failed_txn = {
-                    'loan_id': loan_id,
-                    'transaction_id': txn_id,
-                    'transaction_date': self.format_date_for_api(txn_date),
-                    'transaction_amount': txn_amount,
-                    'payment_type_id': latest_target_txn.get('paymentDetailData', {}).get('paymentType', {}).get('id', 0),
-                    'channel_type_id': latest_target_txn.get('paymentDetailData', {}).get('channelType', {}).get('id', 0),
-                    'status': 'failed',
-                    'error': error_msg
-                }
+                failed_txn = dict(txn_details, status='failed', error=error_msg)
                 
                 undone_transactions.append(failed_txn)
                 failure_count += 1
                 remaining_ids.remove(txn_id)
                 
                 # Continue trying other transactions even if one fails
-                print(f"DEBUG: Continuing with remaining {len(remaining_ids)} transactions")
+                logger.debug("Continuing with remaining %d transactions", len(remaining_ids))
+                
+                # The server state may no longer match the plan; re-fetch and re-plan
+                if remaining_ids:
+                    try:
+                        transactions = self.client.get_loan_transactions(loan_id)
+                    except Exception as e:
+                        logger.error("Failed to fetch loan: %s", e)
+                        break
+                    
+                    undo_queue = deque(self._order_undo_targets(transactions, remaining_ids))
+        
+        # If some targets could not be found, something's wrong
+        if remaining_ids:
+            logger.error("Could not undo remaining target transactions: %s", remaining_ids)
         
-        print(f"\n=== UNDO COMPLETE ===")
-        print(f"Success: {success_count} | Failed: {failure_count}")
-        print(f"Session folder: {session_folder}")
+        logger.info(
+            "=== UNDO COMPLETE === Success: %d | Failed: %d | Session folder: %s",
+            success_count, failure_count, session_folder
+        )
         
         # Save to session storage
         session_storage.save_transactions(undone_transactions)
         
         return undone_transactions, success_count, failure_count
     
+    @staticmethod
+    def _plan_replay_rounds(sorted_transactions: List[Dict[str, Any]]) -> List[List[int]]:
+        """
+        Split date-sorted transactions into rounds that can run concurrently
+        
+        Rounds never span two dates, and each round holds at most one
+        transaction per loan, so every loan still sees its repayments one
+        at a time in the original order.
+        
+        Args:
+            sorted_transactions: Transactions sorted by date
+            
+        Returns:
+            Rounds of positions into sorted_transactions, in execution order
+        """
+        rounds = []
+        current_date = None
+        date_rounds = []
+        unplannable = []
+        loan_counts = {}
+        
+        for pos, txn in enumerate(sorted_transactions):
+            txn_date = txn.get('transaction_date')
+            if txn_date != current_date:
+                rounds.extend(date_rounds)
+                rounds.extend([p] for p in unplannable)
+                current_date = txn_date
+                date_rounds = []
+                unplannable = []
+                loan_counts = {}
+            
+            # Group on the loan ID exactly as it is sent to the API, so 5,
+            # 5.0 and "5" count as one loan
+            try:
+                loan_id = int(txn['loan_id'])
+            except (KeyError, TypeError, ValueError):
+                # Fails when its arguments are built; give it a round of its own
+                unplannable.append(pos)
+                continue
+            
+            # The n-th transaction of a loan on this date goes to round n
+            index = loan_counts.get(loan_id, 0)
+            loan_counts[loan_id] = index + 1
+            
+            if index == len(date_rounds):
+                date_rounds.append([])
+            date_rounds[index].append(pos)
+        
+        rounds.extend(date_rounds)
+        rounds.extend([p] for p in unplannable)
+        return rounds
+    
     def replay_transactions(self, transactions: List[Dict[str, Any]]) -> Tuple[int, int]:
         """
         Replay transactions sorted by date
@@ -281,74 +385,91 @@ class TransactionManager:
         Returns:
             Tuple of (success_count, failure_count)
         """
-        # Create session folder for replay
-        from datetime import datetime
-        import os
-        
         # Try to use the most recent session folder, or create a new one
-        base_dir = os.path.dirname(self.storage.file_path)
-        session_folders = [f for f in os.listdir(base_dir) if f.startswith('session_') and os.path.isdir(os.path.join(base_dir, f))]
+        base_dir = self._base_dir
+        with os.scandir(base_dir) as entries:
+            session_folders = [e.name for e in entries if e.name.startswith('session_') and e.is_dir()]
         
         if session_folders:
-            # Use the most recent session folder
-            session_folders.sort(reverse=True)
-            session_folder = os.path.join(base_dir, session_folders[0])
-            print(f"\nUsing existing session folder: {session_folder}")
+            # Use the most recent session folder (names include the timestamp)
+            session_folder = os.path.join(base_dir, max(session_folders))
+            logger.info("Using existing session folder: %s", session_folder)
         else:
             # Create new session folder
             session_timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
             session_folder = os.path.join(base_dir, f"session_{session_timestamp}_replay")
             os.makedirs(session_folder, exist_ok=True)
-            print(f"\nCreated new session folder: {session_folder}")
+            logger.info("Created new session folder: %s", session_folder)
         
-        # Sort transactions by date
-        sorted_transactions = sorted(
-            transactions,
-            key=lambda x: self.parse_date_string(x['transaction_date'])
-        )
+        # Sort transactions by date (each date parsed exactly once; the
+        # sort is stable, so same-date transactions keep their input order)
+        annotated = [(self.parse_date_string(txn['transaction_date']), txn) for txn in transactions]
+        annotated.sort(key=lambda pair: pair[0])
+        sorted_transactions = [txn for _, txn in annotated]
         
-        print(f"\nDEBUG: Starting replay of {len(sorted_transactions)} transactions")
+        logger.debug("Starting replay of %d transactions", len(sorted_transactions))
         
         success_count = 0
         failure_count = 0
+        # Results are kept in replay (date) order, whatever order calls finish in
+        outcomes = [None] * len(sorted_transactions)
+        
+        for round_positions in self._plan_replay_rounds(sorted_transactions):
+            # Build the API arguments; bad data fails only its own transaction
+            items = []
+            item_positions = {}
+            for pos in round_positions:
+                txn = sorted_transactions[pos]
+                logger.debug(
+                    "Replaying %d/%d: Transaction %s, Date: %s, Amount: %s",
+                    pos + 1, len(sorted_transactions), txn.get('transaction_id'),
+                    txn.get('transaction_date'), txn.get('transaction_amount')
+                )
+                try:
+                    item = {
+                        'loan_id': int(txn['loan_id']),
+                        'transaction_amount': float(txn['transaction_amount']),
+                        'transaction_date': txn['transaction_date'],
+                        'payment_type_id': int(txn['payment_type_id']),
+                        'channel_type_id': int(txn['channel_type_id'])
+                    }
+                except Exception as e:
+                    outcomes[pos] = (None, e)
+                    continue
+                items.append(item)
+                item_positions[id(item)] = pos
+            if not items:
+                continue
+            
+            # Transactions in a round are on different loans, so they can be posted concurrently
+            for item, response, error in self.client.batch_create_repayment(items):
+                outcomes[item_positions[id(item)]] = (response, error)
+        
         replayed_transactions = []
         
-        for i, txn in enumerate(sorted_transactions, 1):
-            try:
-                print(f"\nDEBUG: Replaying {i}/{len(sorted_transactions)}: Transaction {txn.get('transaction_id')}, Date: {txn.get('transaction_date')}, Amount: {txn.get('transaction_amount')}")
-                
-                response = self.client.create_repayment(
-                    loan_id=int(txn['loan_id']),
-                    transaction_amount=float(txn['transaction_amount']),
-                    transaction_date=txn['transaction_date'],
-                    payment_type_id=int(txn['payment_type_id']),
-                    channel_type_id=int(txn['channel_type_id'])
-                )
-                
+        for txn, (response, error) in zip(sorted_transactions, outcomes):
+            replayed_txn = txn.copy()
+            
+            if error is None:
                 # Save successful replay
-                replayed_txn = txn.copy()
                 replayed_txn['replay_status'] = 'success'
                 replayed_txn['new_transaction_id'] = response.get('resourceId')
-                replayed_transactions.append(replayed_txn)
                 
                 success_count += 1
-                print(f"✅ Successfully replayed transaction {txn.get('transaction_id')}")
-                
-            except Exception as e:
+                logger.info("✅ Successfully replayed transaction %s", txn.get('transaction_id'))
+            else:
                 # Save failed replay with error
-                replayed_txn = txn.copy()
                 replayed_txn['replay_status'] = 'failed'
-                replayed_txn['replay_error'] = str(e)
-                replayed_transactions.append(replayed_txn)
+                replayed_txn['replay_error'] = str(error)
                 
                 failure_count += 1
-                print(f"❌ REPLAY FAILED for transaction {txn.get('transaction_id')}: {str(e)}")
+                logger.error("❌ REPLAY FAILED for transaction %s: %s", txn.get('transaction_id'), error)
+            
+            replayed_transactions.append(replayed_txn)
         
-        print(f"\n=== REPLAY COMPLETE ===")
-        print(f"Success: {success_count} | Failed: {failure_count}")
+        logger.info("=== REPLAY COMPLETE === Success: %d | Failed: %d", success_count, failure_count)
         
         # Save replay results to a SEPARATE JSON file to preserve undo history
-        from datetime import datetime
         replay_data = {
             "timestamp": datetime.now().isoformat(),
             "replay_results": replayed_transactions,
@@ -360,14 +481,11 @@ class TransactionManager:
         }
         
         # Save to replay_results.json instead of overwriting transactions.json
-        import os
         replay_file = os.path.join(session_folder, 'replay_results.json')
         
-        import json
-        with open(replay_file, 'w', encoding='utf-8') as f:
-            json.dump(replay_data, f, indent=2, ensure_ascii=False, cls=DateTimeEncoder)
+        with open(replay_file, 'wb') as f:
+            f.write(dump_json(replay_data))
         
-        print(f"Replay results saved to: {replay_file}")
-        print(f"Session folder: {session_folder}")
+        logger.info("Replay results saved to: %s", replay_file)
         
         return success_count, failure_count